@@ -0,0 +1,98 @@
+# process_metadata.py 与 sh_to_starward.py 共用的 JSON 读写与 Starward 文件读写
+# （不能命名为 _io.py：会与标准库内置的 _io 模块重名）
+import json
+import mmap
+import os
+from dataclasses import asdict
+from typing import Dict
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from _models import StarwardUIGF, StarwardUserBundle, StarwardRecord, StarwardMetaItem, StarwardMetaDB
+
+# 小于该大小的文件直接 read()，mmap 的建立开销反而更大
+_MMAP_THRESHOLD = 64 * 1024
+
+def load_json(filename: str):
+    # 二进制读取后直接交给 orjson 解析，省去 str 解码这一步
+    with open(filename, "rb") as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size >= _MMAP_THRESHOLD:
+            # 大文件：mmap 后直接从映射内存解析，不再额外拷贝一份完整内容
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # 部分网络盘/特殊文件不支持 mmap，退回下面的 read()
+                mm = None
+            if mm is not None:
+                try:
+                    with memoryview(mm) as view:
+                        return orjson.loads(view)
+                finally:
+                    mm.close()
+        # 无参 read() 会按 fstat 得到的文件大小一次性读入，系统调用次数与缓冲区大小无关，
+        # 因此这里无需调大 open() 的 buffering
+        raw = f.read()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def dump_json(obj, filename: str):
+    # orjson 直接输出 UTF-8 字节，以二进制写入，避免文本模式的二次编码
+    if orjson is not None:
+        # 输出的键（含 by_id）均为 str，无需 OPT_NON_STR_KEYS 的额外键转换
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    with open(filename, "wb") as f:
+        f.write(data)
+
+def output_starward_db(sw_metas: StarwardMetaDB, outfile: str):
+    # 输出结构与原 by_id 映射保持一致
+    dump_json({"by_id": {iid: asdict(meta) for iid, meta in sw_metas.by_id.items()}}, outfile)
+
+def read_starward_meta_db(filename: str, validate: bool = False) -> StarwardMetaDB:
+    data = load_json(filename)
+    db = StarwardMetaDB()
+    by_id = data.get("by_id", {})
+    # 自家工具生成的可信数据：默认直接构造；validate=True 时在 I/O 边界用 pydantic 完整校验
+    if validate:
+        try:
+            db.by_id = TypeAdapter(Dict[str, StarwardMetaItem]).validate_python(by_id)
+        except Exception as e:
+            raise RuntimeError(f"Starward 元数据验证失败: {e}") from e
+        return db
+    try:
+        for iid, meta in by_id.items():
+            db.by_id[str(iid)] = StarwardMetaItem.from_dict(meta)
+    except Exception as e:
+        raise RuntimeError(f"Starward 元数据读取失败: {e}") from e
+    return db
+
+def read_starward_uigf4(filename: str, validate: bool = False) -> StarwardUIGF:
+    data = load_json(filename)
+    if validate:
+        try:
+            # 使用 model_validate 接受 dict
+            return StarwardUIGF.model_validate(data)
+        except Exception as e:
+            raise RuntimeError(f"Starward UIGF 验证失败: {e}") from e
+    # 可信输入：外层 model_construct、记录 from_dict，跳过逐字段类型转换
+    try:
+        hk4e = [
+            StarwardUserBundle.model_construct(
+                uid=u["uid"],
+                timezone=u.get("timezone"),
+                lang=u.get("lang"),
+                list=[StarwardRecord.from_dict(r) for r in u.get("list", [])],
+            )
+            for u in data.get("hk4e", [])
+        ]
+        return StarwardUIGF.model_construct(
+            info=data["info"], hk4e=hk4e, hkrpg=data.get("hkrpg"), nap=data.get("nap")
+        )
+    except Exception as e:
+        raise RuntimeError(f"Starward UIGF 读取失败: {e}") from e
@@ -0,0 +1,123 @@
+# process_metadata.py 与 sh_to_starward.py 共用的数据模型
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+
+# Starward 单条抽卡记录（文件中 hk4e[].list 的项）
+# 记录数量可达十万级，使用 slots dataclass 而非 pydantic 模型；--validate 时仍由外层模型校验
+@dataclass(slots=True)
+class StarwardRecord:
+    uigf_gacha_type: Optional[str] = None
+    uid: Optional[str] = None
+    id: Optional[str] = None
+    gacha_type: Optional[str] = None
+    name: Optional[str] = None
+    item_type: Optional[str] = None
+    rank_type: Optional[str] = None
+    time: Optional[str] = None
+    item_id: Optional[str] = None
+    count: Optional[str] = None
+    lang: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "StarwardRecord":
+        # 未声明的键没有任何代码读取，直接忽略
+        fields = cls.__dataclass_fields__
+        return cls(**{k: v for k, v in d.items() if k in fields})
+
+# Starward 用户级别容器（hk4e 列表项）
+class StarwardUserBundle(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
+    uid: str
+    timezone: Optional[int] = None
+    lang: Optional[str] = None
+    list: List[StarwardRecord] = Field(default_factory=list)
+
+# Starward UIGF 顶层结构
+class StarwardUIGF(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
+    info: Dict[str, Any]
+    hk4e: List[StarwardUserBundle] = Field(default_factory=list)
+    hkrpg: Optional[List[Any]] = None
+    nap: Optional[List[Any]] = None
+
+# Snap Hutao 单条记录（其 hk4e[].list 的项，字段通常较少）
+@dataclass(slots=True)
+class SnapHutaoRecord:
+    uigf_gacha_type: Optional[str] = None
+    gacha_type: Optional[str] = None
+    item_id: Optional[str] = None
+    time: Optional[str] = None
+    id: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "SnapHutaoRecord":
+        fields = cls.__dataclass_fields__
+        return cls(**{k: v for k, v in d.items() if k in fields})
+
+# Snap Hutao 用户级别容器与顶层
+class SnapHutaoUserBundle(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
+    uid: str
+    timezone: Optional[int] = None
+    list: List[SnapHutaoRecord] = Field(default_factory=list)
+
+class SnapHutaoUIGF(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
+    info: Dict[str, Any]
+    hk4e: List[SnapHutaoUserBundle] = Field(default_factory=list)
+
+# Starward 元数据数据库项（用于 output_starward_db 的结构）
+# 条目数量大且只在内部读写，使用 slots dataclass 而非 pydantic 模型
+@dataclass(slots=True, kw_only=True)
+class StarwardMetaItem:
+    name: str
+    item_type: Optional[str] = None
+    rank_type: Optional[str] = None
+    item_id: str
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "StarwardMetaItem":
+        # 与 --validate 路径一致：忽略未声明的键
+        fields = cls.__dataclass_fields__
+        return cls(**{k: v for k, v in d.items() if k in fields})
+
+# Starward 元数据数据库容器（通过 item_id 映射到元数据）
+class StarwardMetaDB:
+    __slots__ = ("by_id",)
+
+    def __init__(self):
+        self.by_id: Dict[str, StarwardMetaItem] = {}
+
+    def get(self, item_id: str) -> Optional[StarwardMetaItem]:
+        return self.by_id.get(item_id)
+    
+    def add_from_record(self, rec: StarwardRecord):
+        # 如果没有 item_id 就跳过
+        if not rec.item_id:
+            return
+        iid = str(rec.item_id)
+        # 单次 get 代替 in + 下标两次查找
+        meta = self.by_id.get(iid)
+        # 若不存在则创建新条目
+        if meta is None:
+            self.by_id[iid] = StarwardMetaItem(
+                name=rec.name or "",
+                item_type=rec.item_type,
+                rank_type=rec.rank_type,
+                item_id=iid,
+            )
+        else:
+            # 已存在：用记录中非空字段补全已有条目
+            if not meta.name and rec.name:
+                meta.name = rec.name
+            if (not meta.item_type) and rec.item_type:
+                meta.item_type = rec.item_type
+            if (not meta.rank_type) and rec.rank_type:
+                meta.rank_type = rec.rank_type
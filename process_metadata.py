@@ -1,124 +1,27 @@
-import json
 import sys
-import pandas as pd
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
-import tkinter as tk
-from tkinter import ttk, messagebox
-from tkinter import filedialog
-
-# Starward 单条抽卡记录（文件中 hk4e[].list 的项）
-class StarwardRecord(BaseModel):
-    uigf_gacha_type: Optional[str] = None
-    uid: Optional[str] = None
-    id: Optional[str] = None
-    gacha_type: Optional[str] = None
-    name: Optional[str] = None
-    item_type: Optional[str] = None
-    rank_type: Optional[str] = None
-    time: Optional[str] = None
-    item_id: Optional[str] = None
-    count: Optional[str] = None
-    lang: Optional[str] = None
-    extra: Dict[str, Any] = Field(default_factory=dict)
-
-    class Config:
-        extra = "allow"
-
-# Starward 用户级别容器（hk4e 列表项）
-class StarwardUserBundle(BaseModel):
-    uid: str
-    timezone: Optional[int] = None
-    lang: Optional[str] = None
-    list: List[StarwardRecord] = Field(default_factory=list)
-
-# Starward UIGF 顶层结构
-class StarwardUIGF(BaseModel):
-    info: Dict[str, Any]
-    hk4e: List[StarwardUserBundle] = Field(default_factory=list)
-    hkrpg: Optional[List[Any]] = None
-    nap: Optional[List[Any]] = None
-
-# Starward 元数据数据库项（用于 output_starward_db 的结构）
-class StarwardMetaItem(BaseModel):
-    name: str
-    item_type: Optional[str] = None
-    rank_type: Optional[str] = None
-    item_id: str
-
-# Starward 元数据数据库容器（通过 item_id 映射到元数据）
-class StarwardMetaDB(BaseModel):
-    by_id: Dict[str, StarwardMetaItem] = Field(default_factory=dict)
-
-    def get(self, item_id: str) -> Optional[StarwardMetaItem]:
-        return self.by_id.get(item_id)
-    
-    def add_from_record(self, rec: StarwardRecord):
-        # 如果没有 item_id 就跳过
-        if not rec.item_id:
-            return
-        iid = str(rec.item_id)
-        # 若不存在则创建新条目
-        if iid not in self.by_id:
-            self.by_id[iid] = StarwardMetaItem(
-                name=rec.name or "",
-                item_type=rec.item_type,
-                rank_type=rec.rank_type,
-                item_id=iid,
-            )
-        else:
-            # 已存在：用记录中非空字段补全已有条目
-            meta = self.by_id[iid]
-            if (not meta.name or meta.name == "") and rec.name:
-                meta.name = rec.name
-            if (not meta.item_type) and rec.item_type:
-                meta.item_type = rec.item_type
-            if (not meta.rank_type) and rec.rank_type:
-                meta.rank_type = rec.rank_type
-
-def output_starward_db(sw_metas: StarwardMetaDB, outfile: str):
-    # 使用 model_dump 输出结构化 JSON
-    with open(outfile, "w", encoding="utf-8") as f:
-        json.dump(sw_metas.model_dump(), f, ensure_ascii=False, indent=2)
-
-def read_starward_meta_db(filename: str) -> StarwardMetaDB:
-    with open(filename, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    db = StarwardMetaDB()
-    by_id = data.get("by_id", {})
-    for iid, meta in by_id.items():
-        db.by_id[str(iid)] = StarwardMetaItem(**meta)
-    return db
+from itertools import chain
+from typing import Dict
 
-def read_starward_uigf4(filename: str) -> StarwardUIGF:
-    with open(filename, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    try:
-        # 使用 model_validate 接受 dict
-        uigf = StarwardUIGF.model_validate(data)
-    except Exception as e:
-        raise RuntimeError(f"Starward UIGF 验证失败: {e}") from e
-    return uigf
+from _models import StarwardUIGF, StarwardMetaItem, StarwardMetaDB
+from _json_io import load_json, output_starward_db, read_starward_meta_db, read_starward_uigf4
 
 def UIGF_id_name_mapping(filename):
     # 读取 mapping 文件，支持 { name: [ids...] } 或 { name: id } 两种格式
     # url: https://api.uigf.org/dict/genshin/chs.json
-    with open(filename, "r", encoding="utf-8") as f:
-        name_to_id = json.load(f)
+    name_to_id = load_json(filename)
     id_to_name: Dict[str, str] = {}
     for name, ids in name_to_id.items():
-        if isinstance(ids, (list, tuple, set)):
-            for iid in ids:
-                id_to_name[str(iid)] = name
-        else:
-            id_to_name[str(ids)] = name
+        # 单个 id 统一包装成元组，再批量写入
+        if not isinstance(ids, (list, tuple, set)):
+            ids = (ids,)
+        id_to_name.update((str(iid), name) for iid in ids)
     return id_to_name, name_to_id
 
 def build_meta_db_from_mapping(mapping_file: str) -> StarwardMetaDB:
     id_to_name, _ = UIGF_id_name_mapping(mapping_file)
     db = StarwardMetaDB()
-    for iid, name in id_to_name.items():
-        db.by_id[str(iid)] = StarwardMetaItem(name=name, item_id=str(iid))
+    # id_to_name 的键已是 str
+    db.by_id = {iid: StarwardMetaItem(name=name, item_id=iid) for iid, name in id_to_name.items()}
     return db
 
 def prompt_missing_meta_fields(sw_meta_db: StarwardMetaDB):
@@ -128,23 +31,46 @@ def prompt_missing_meta_fields(sw_meta_db: StarwardMetaDB):
 
     # 收集待处理条目（存在 name 与 item_id，且缺少 item_type 或 rank_type）
     pending = []
-    try:
-        def _key(kv):
-            k = kv[0]
-            return (0, int(k)) if str(k).isdigit() else (1, str(k))
-        items = sorted(sw_meta_db.by_id.items(), key=_key)
-    except Exception:
-        items = list(sw_meta_db.by_id.items())
+    # 纯数字 id 按数值升序排在前，其余按字符串排序；键只转换一次
+    by_id = sw_meta_db.by_id
+    keys = list(by_id.keys())
+    numeric = [(int(k), k) for k in keys if k.isdecimal()]
+    numeric.sort()
+    non_numeric = sorted(k for k in keys if not k.isdecimal())
+    items = [(k, by_id[k]) for k in chain((k for _, k in numeric), non_numeric)]
 
     for iid, meta in items:
         if not meta or not getattr(meta, "item_id", None) or not getattr(meta, "name", None):
             continue
         if (not meta.item_type) or (not meta.rank_type):
-            pending.append((iid, meta))
+            # 向导/命令行只改这份快照，结束后再一次性写回元数据
+            pending.append({
+                "iid": iid,
+                "name": meta.name,
+                "item_type": meta.item_type or "",
+                "rank_type": meta.rank_type or "",
+                "_meta": meta,
+            })
 
     if not pending:
         return
 
+    def commit_pending():
+        # 仅补全缺失字段，已有值不覆盖；未填写的保持 None
+        for row in pending:
+            m = row["_meta"]
+            if not m.item_type:
+                m.item_type = row["item_type"] or None
+            if not m.rank_type:
+                m.rank_type = row["rank_type"] or None
+
+    # 仅在真正需要交互时才加载 tkinter，无界面环境下不付出 GUI 的导入开销
+    try:
+        import tkinter as tk
+        from tkinter import ttk, messagebox
+    except ImportError:
+        tk = None
+
     # 开启 Windows DPI 感知，减少缩放导致的遮挡
     try:
         import ctypes
@@ -155,7 +81,7 @@ def prompt_missing_meta_fields(sw_meta_db: StarwardMetaDB):
 
     if tk is not None:
         class MetaFillWizard(tk.Tk):
-            def __init__(self, items):
+            def __init__(self, snapshot):
                 super().__init__()
                 self.title("补全 Starward 元数据")
                 # 允许拉伸，设置最小尺寸
@@ -168,7 +94,8 @@ def prompt_missing_meta_fields(sw_meta_db: StarwardMetaDB):
                 except Exception:
                     pass
 
-                self.items = items
+                # 按排序后的待处理快照导航，每次切换只读写 dict
+                self.snapshot = snapshot
                 self.index = 0
 
                 # 顶层网格使容器可伸缩
@@ -249,24 +176,24 @@ def prompt_missing_meta_fields(sw_meta_db: StarwardMetaDB):
                 self.geometry(f"{req_w}x{req_h}+{x}+{y}")
 
             def load_current(self):
-                iid, meta = self.items[self.index]
-                self.lbl_title.config(text=f"待处理 {self.index+1}/{len(self.items)}")
-                self.var_name.set(meta.name or "")
-                self.var_id.set(str(iid))
+                row = self.snapshot[self.index]
+                self.lbl_title.config(text=f"待处理 {self.index+1}/{len(self.snapshot)}")
+                self.var_name.set(row["name"] or "")
+                self.var_id.set(str(row["iid"]))
 
                 # 已有值用已有，否则默认
-                self.var_type.set(meta.item_type if meta.item_type in ITEM_TYPES else ITEM_TYPES[0])
-                self.var_rank.set(meta.rank_type if meta.rank_type in RANK_CHOICES else RANK_CHOICES[-1])
+                self.var_type.set(row["item_type"] if row["item_type"] in ITEM_TYPES else ITEM_TYPES[0])
+                self.var_rank.set(row["rank_type"] if row["rank_type"] in RANK_CHOICES else RANK_CHOICES[-1])
 
                 # 导航按钮可用性
                 self.btn_prev.configure(state=("normal" if self.index > 0 else "disabled"))
 
             def save_current(self):
-                iid, meta = self.items[self.index]
-                if not meta.item_type:
-                    meta.item_type = self.var_type.get()
-                if not meta.rank_type:
-                    meta.rank_type = self.var_rank.get()
+                row = self.snapshot[self.index]
+                if not row["item_type"]:
+                    row["item_type"] = self.var_type.get()
+                if not row["rank_type"]:
+                    row["rank_type"] = self.var_rank.get()
 
             def on_prev(self):
                 if self.index > 0:
@@ -274,7 +201,7 @@ def prompt_missing_meta_fields(sw_meta_db: StarwardMetaDB):
                     self.load_current()
 
             def on_skip(self):
-                if self.index < len(self.items) - 1:
+                if self.index < len(self.snapshot) - 1:
                     self.index += 1
                     self.load_current()
                 else:
@@ -282,7 +209,7 @@ def prompt_missing_meta_fields(sw_meta_db: StarwardMetaDB):
 
             def on_save_next(self):
                 self.save_current()
-                if self.index < len(self.items) - 1:
+                if self.index < len(self.snapshot) - 1:
                     self.index += 1
                     self.load_current()
                 else:
@@ -297,65 +224,84 @@ def prompt_missing_meta_fields(sw_meta_db: StarwardMetaDB):
 
         app = MetaFillWizard(pending)
         app.mainloop()
+        # 完成或取消都会关闭窗口；已填写内容在此统一写回
+        commit_pending()
         return
 
     # CLI 回退（tkinter 不可用时）
     print("\nGUI 不可用，进入命令行模式：")
-    for iid, meta in pending:
-        print(f"\nitem_id={iid}  name={meta.name}")
-        if not meta.item_type:
-            while True:
-                print("请选择物品类型： 1. 武器  2. 角色")
+    ITEM_MAP = {"1": "武器", "2": "角色"}
+    MAX_ATTEMPTS = 3
+    for row in pending:
+        print(f"\nitem_id={row['iid']}  name={row['name']}")
+        if not row["item_type"]:
+            print("请选择物品类型： 1. 武器  2. 角色")
+            for _ in range(MAX_ATTEMPTS):
                 v = input("输入编号(回车跳过)：").strip()
-                if v == "":
+                if v == "" or v in ITEM_MAP:
+                    row["item_type"] = ITEM_MAP.get(v, "")
                     break
-                if v == "1":
-                    meta.item_type = "武器"; break
-                if v == "2":
-                    meta.item_type = "角色"; break
                 print("无效输入，请重试。")
-        if not meta.rank_type:
-            while True:
-                print("请选择稀有度(rank_type)： 1/2/3/4/5")
+            else:
+                print("多次输入无效，已跳过。")
+        if not row["rank_type"]:
+            print("请选择稀有度(rank_type)： 1/2/3/4/5")
+            for _ in range(MAX_ATTEMPTS):
                 v = input("输入数值(回车跳过)：").strip()
-                if v == "":
+                if v == "" or v in RANK_CHOICES:
+                    row["rank_type"] = v
                     break
-                if v in RANK_CHOICES:
-                    meta.rank_type = v; break
                 print("无效输入，请重试。")
-
+            else:
+                print("多次输入无效，已跳过。")
+    commit_pending()
+
+
+def add_records_from_uigf(db: StarwardMetaDB, uigf: StarwardUIGF):
+    # 同一物品会在记录中重复出现成千上万次，而 add_from_record 对相同输入是幂等的；
+    # 用 (item_id, name, item_type, rank_type) 去重，重复记录直接跳过
+    seen = set()
+    add = db.add_from_record
+    # 先把所有用户的记录摊平成一条流，省去双层循环
+    for rec in chain.from_iterable(user.list for user in uigf.hk4e):
+        key = (rec.item_id, rec.name, rec.item_type, rec.rank_type)
+        if key in seen:
+            continue
+        seen.add(key)
+        add(rec)
 
 def build_meta_db_from_uigf(uigf: StarwardUIGF) -> StarwardMetaDB:
     db = StarwardMetaDB()
-    for user in uigf.hk4e:
-        for rec in user.list:
-            db.add_from_record(rec)
+    add_records_from_uigf(db, uigf)
     return db
 
 def merge_meta_db(into: "StarwardMetaDB", src: "StarwardMetaDB"):
     # 仅在 into 缺失时，用 src 的非空值进行补全
+    dst = into.by_id
+    dst_get = dst.get
     for iid, s in src.by_id.items():
-        if iid not in into.by_id:
-            into.by_id[iid] = StarwardMetaItem(
+        t = dst_get(iid)
+        if t is None:
+            dst[iid] = StarwardMetaItem(
                 name=s.name or "",
                 item_type=s.item_type,
                 rank_type=s.rank_type,
                 item_id=str(iid),
             )
             continue
-        t = into.by_id[iid]
-        if (not t.name or t.name == "") and s.name:
+        if not t.name and s.name:
             t.name = s.name
         if (not t.item_type) and s.item_type:
             t.item_type = s.item_type
         if (not t.rank_type) and s.rank_type:
             t.rank_type = s.rank_type
 
-def merge_mapping_and_starward(mapping_file: str, starward_file: str, meta_file: str):
+def merge_mapping_and_starward(mapping_file: str, starward_file: str, meta_file: str, validate: bool = False):
     # 0) 读取已有 meta（允许不完整/不存在）
+    # 仅文件不存在时从空库开始；文件损坏时直接报错，避免第 4 步覆盖掉已有内容
     try:
-        base_db = read_starward_meta_db(meta_file)
-    except Exception:
+        base_db = read_starward_meta_db(meta_file, validate)
+    except FileNotFoundError:
         base_db = StarwardMetaDB()
 
     # 1) 用 mapping 补齐所有 name/item_id（不覆盖已有有效值）
@@ -363,10 +309,8 @@ def merge_mapping_and_starward(mapping_file: str, starward_file: str, meta_file:
     merge_meta_db(base_db, mapping_db)
 
     # 2) 用 starward 记录补全（add_from_record 仅补缺）
-    uigf = read_starward_uigf4(starward_file)
-    for user in uigf.hk4e:
-        for rec in user.list:
-            base_db.add_from_record(rec)
+    uigf = read_starward_uigf4(starward_file, validate)
+    add_records_from_uigf(base_db, uigf)
 
     # 3) 交互补表
     print("以下字段仍然缺失，请手动填写：")
@@ -378,8 +322,12 @@ def merge_mapping_and_starward(mapping_file: str, starward_file: str, meta_file:
     return base_db
 
 if __name__ == "__main__":
+    # --validate：输入来源不可信时，对所有文件做完整 pydantic 校验
+    validate = "--validate" in sys.argv[1:]
+    args = [a for a in sys.argv[1:] if a != "--validate"]
     merge_mapping_and_starward(
-        sys.argv[1],  # mapping_file
-        sys.argv[2],  # starward_file
-        sys.argv[3],  # meta_file
+        args[0],  # mapping_file
+        args[1],  # starward_file
+        args[2],  # meta_file
+        validate=validate,
     )
\ No newline at end of file
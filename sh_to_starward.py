@@ -1,156 +1,101 @@
-import json
+import os
 import sys
-import pandas as pd
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
-import tkinter as tk
-from tkinter import ttk, messagebox
-from tkinter import filedialog
+from typing import Dict, Any
 
-# Starward 单条抽卡记录（文件中 hk4e[].list 的项）
-class StarwardRecord(BaseModel):
-    uigf_gacha_type: Optional[str] = None
-    uid: Optional[str] = None
-    id: Optional[str] = None
-    gacha_type: Optional[str] = None
-    name: Optional[str] = None
-    item_type: Optional[str] = None
-    rank_type: Optional[str] = None
-    time: Optional[str] = None
-    item_id: Optional[str] = None
-    count: Optional[str] = None
-    lang: Optional[str] = None
-    extra: Dict[str, Any] = Field(default_factory=dict)
+from _models import SnapHutaoUIGF, SnapHutaoUserBundle, SnapHutaoRecord, StarwardMetaItem, StarwardMetaDB
+from _json_io import load_json, dump_json, read_starward_meta_db
 
-    class Config:
-        extra = "allow"
-
-# Starward 用户级别容器（hk4e 列表项）
-class StarwardUserBundle(BaseModel):
-    uid: str
-    timezone: Optional[int] = None
-    lang: Optional[str] = None
-    list: List[StarwardRecord] = Field(default_factory=list)
-
-# Starward UIGF 顶层结构
-class StarwardUIGF(BaseModel):
-    info: Dict[str, Any]
-    hk4e: List[StarwardUserBundle] = Field(default_factory=list)
-    hkrpg: Optional[List[Any]] = None
-    nap: Optional[List[Any]] = None
-
-# Snap Hutao 单条记录（其 hk4e[].list 的项，字段通常较少）
-class SnapHutaoRecord(BaseModel):
-    uigf_gacha_type: Optional[str] = None
-    gacha_type: Optional[str] = None
-    item_id: Optional[str] = None
-    time: Optional[str] = None
-    id: Optional[str] = None
-    extra: Dict[str, Any] = Field(default_factory=dict)
-    class Config:
-        extra = "allow"
-
-# Snap Hutao 用户级别容器与顶层
-class SnapHutaoUserBundle(BaseModel):
-    uid: str
-    timezone: Optional[int] = None
-    list: List[SnapHutaoRecord] = Field(default_factory=list)
-
-class SnapHutaoUIGF(BaseModel):
-    info: Dict[str, Any]
-    hk4e: List[SnapHutaoUserBundle] = Field(default_factory=list)
-
-# Starward 元数据数据库项（用于 output_starward_db 的结构）
-class StarwardMetaItem(BaseModel):
-    name: str
-    item_type: Optional[str] = None
-    rank_type: Optional[str] = None
-    item_id: str
-
-# Starward 元数据数据库容器（通过 item_id 映射到元数据）
-class StarwardMetaDB(BaseModel):
-    by_id: Dict[str, StarwardMetaItem] = Field(default_factory=dict)
-
-    def get(self, item_id: str) -> Optional[StarwardMetaItem]:
-        return self.by_id.get(item_id)
-
-def output_starward_db(sw_metas: StarwardMetaDB, outfile: str):
-    # 使用 model_dump 输出结构化 JSON
-    with open(outfile, "w", encoding="utf-8") as f:
-        json.dump(sw_metas.model_dump(), f, ensure_ascii=False, indent=2)
-
-def read_starward_meta_db(filename: str) -> StarwardMetaDB:
-    with open(filename, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    db = StarwardMetaDB()
-    by_id = data.get("by_id", {})
-    for iid, meta in by_id.items():
-        db.by_id[str(iid)] = StarwardMetaItem(**meta)
-    return db
-
-def read_starward_uigf4(filename: str) -> StarwardUIGF:
-    with open(filename, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    try:
-        # 使用 model_validate 接受 dict
-        uigf = StarwardUIGF.model_validate(data)
-    except Exception as e:
-        raise RuntimeError(f"Starward UIGF 验证失败: {e}") from e
-    return uigf
-
-def read_snap_hutao_uigf4(filename: str) -> SnapHutaoUIGF:
-    with open(filename, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def read_snap_hutao_uigf4(filename: str, validate: bool = False) -> SnapHutaoUIGF:
+    data = load_json(filename)
+    if validate:
+        try:
+            return SnapHutaoUIGF.model_validate(data)
+        except Exception as e:
+            raise RuntimeError(f"Snap Hutao UIGF 验证失败: {e}") from e
     try:
-        uigf = SnapHutaoUIGF.model_validate(data)
+        hk4e = [
+            SnapHutaoUserBundle.model_construct(
+                uid=u["uid"],
+                timezone=u.get("timezone"),
+                list=[SnapHutaoRecord.from_dict(r) for r in u.get("list", [])],
+            )
+            for u in data.get("hk4e", [])
+        ]
+        return SnapHutaoUIGF.model_construct(info=data["info"], hk4e=hk4e)
     except Exception as e:
-        raise RuntimeError(f"Snap Hutao UIGF 验证失败: {e}") from e
-    return uigf
-
-def convert_snap_hutao_to_starward(snap_uigf: SnapHutaoUIGF, sw_meta_db: StarwardMetaDB) -> StarwardUIGF:
+        raise RuntimeError(f"Snap Hutao UIGF 读取失败: {e}") from e
+
+def _starward_record_dict(r: SnapHutaoRecord, uid: str, m: StarwardMetaItem) -> Dict[str, Any]:
+    # 字段顺序与 StarwardRecord 一致；直接丢弃 None 值，等价于 exclude_none
+    rec = {
+        "uigf_gacha_type": r.uigf_gacha_type,
+        "uid": uid,
+        "id": r.id,
+        "gacha_type": r.gacha_type,
+        "name": m.name,
+        "item_type": m.item_type,
+        "rank_type": m.rank_type,
+        "time": r.time,
+        "item_id": r.item_id,
+        "count": "1",
+        "lang": "zh-cn",
+    }
+    rec = {k: v for k, v in rec.items() if v is not None}
+    # 仅当 extra 非空时才加入，等价于 exclude_defaults
+    if r.extra:
+        rec["extra"] = r.extra
+    return rec
+
+def convert_snap_hutao_to_starward(snap_uigf: SnapHutaoUIGF, sw_meta_db: StarwardMetaDB) -> Dict[str, Any]:
+    # 直接生成可序列化的 dict，不再经过 StarwardUIGF 模型与 model_dump 的重复遍历
     export_info = snap_uigf.info.copy()
     export_info["export_app"] = "Converted from Snap Hutao"
-    out = StarwardUIGF(info=export_info, hk4e=[], hkrpg=[], nap=[])
+    hk4e = []
+    # 预先筛出 item_type 与 rank_type 均已填写的条目，逐条转换时只需一次查找
+    complete = {iid: m for iid, m in sw_meta_db.by_id.items() if m.item_type and m.rank_type}
+    missing = set()
     for user in snap_uigf.hk4e:
-        # 默认用户层 lang 为 zh-cn
-        bundle = StarwardUserBundle(uid=user.uid, timezone=user.timezone, lang="zh-cn", list=[])
-        for srec in user.list:
-            iid = str(srec.item_id) if srec.item_id is not None else None
-            meta = sw_meta_db.get(iid) if iid is not None else None
-            if meta is None or meta.item_type is None or meta.rank_type is None:
-                raise RuntimeError(f"无法在元数据数据库中找到 item_id={iid} 的条目，转换失败。请先补全元数据后重试。")
-            # 默认 count=1/lang=zh-cn；仅当 extra 非空时才加入
-            rec_kwargs = dict(
-                uigf_gacha_type=srec.uigf_gacha_type,
-                gacha_type=srec.gacha_type,
-                item_id=srec.item_id,
-                time=srec.time,
-                id=srec.id,
-                uid=user.uid,
-                name=meta.name,
-                item_type=meta.item_type,
-                rank_type=meta.rank_type,
-                count="1",
-                lang="zh-cn",
-            )
-            if getattr(srec, "extra", None):
-                if isinstance(srec.extra, dict) and len(srec.extra) > 0:
-                    rec_kwargs["extra"] = srec.extra
-            rec = StarwardRecord(**rec_kwargs)
-            bundle.list.append(rec)
-        out.hk4e.append(bundle)
-    return out
+        uid = user.uid
+        # 默认 count=1/lang=zh-cn
+        records = [
+            _starward_record_dict(r, uid, m)
+            for r in user.list
+            for m in (complete.get(str(r.item_id)),)
+            if m is not None
+        ]
+        if len(records) != len(user.list):
+            # 有条目被过滤：收集缺失的 item_id，全部扫描完后统一报错
+            missing.update(iid for iid in (str(r.item_id) for r in user.list) if iid not in complete)
+            continue
+        bundle = {"uid": uid}
+        if user.timezone is not None:
+            bundle["timezone"] = user.timezone
+        # 默认用户层 lang 为 zh-cn；list 为 UIGF 必填字段，即使为空也保留
+        bundle["lang"] = "zh-cn"
+        bundle["list"] = records
+        hk4e.append(bundle)
+    if missing:
+        shown = sorted(missing)
+        more = "..." if len(shown) > 20 else ""
+        raise RuntimeError(
+            f"缺少 {len(shown)} 个 item_id 的元数据: {', '.join(shown[:20])}{more}。请先补全元数据后重试。"
+        )
+    return {"info": export_info, "hk4e": hk4e, "hkrpg": [], "nap": []}
 
-def convert_snap_file_with_meta(meta_db_file: str, snap_file: str, out_starward_file: str):
-    db = read_starward_meta_db(meta_db_file)
-    snap = read_snap_hutao_uigf4(snap_file)
+def convert_snap_file_with_meta(meta_db_file: str, snap_file: str, out_starward_file: str, validate: bool = False):
+    db = read_starward_meta_db(meta_db_file, validate)
+    snap = read_snap_hutao_uigf4(snap_file, validate)
     starward_uigf = convert_snap_hutao_to_starward(snap, db)
-    with open(out_starward_file, "w", encoding="utf-8") as f:
-        # exclude_defaults=True 可省略默认 {} 的 extra；exclude_none=True 省略 None 字段
-        json.dump(starward_uigf.model_dump(exclude_none=True, exclude_defaults=True), f, ensure_ascii=False, indent=2)
+    dump_json(starward_uigf, out_starward_file)
 
 
 if __name__ == "__main__":
+    # --validate：输入来源不可信时，对所有文件做完整 pydantic 校验
+    validate = "--validate" in sys.argv[1:]
+    # GUI 仅在脚本直接运行时需要；作为模块导入时不加载 tkinter
+    import tkinter as tk
+    from tkinter import messagebox, filedialog
+
     root = tk.Tk()
     root.withdraw()
     try:
@@ -177,12 +122,11 @@ if __name__ == "__main__":
             messagebox.showinfo("已取消", "未选择输出文件夹。")
             sys.exit(0)
 
-        import os
         from datetime import datetime
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         out_starward_file = os.path.join(out_dir, f"Starward_UIGF_{ts}.json")
 
-        convert_snap_file_with_meta(meta_db_file, snap_file, out_starward_file)
+        convert_snap_file_with_meta(meta_db_file, snap_file, out_starward_file, validate)
         messagebox.showinfo("完成", f"已生成 Starward 数据：\n{out_starward_file}")
     finally:
         try: